@@ -62,13 +62,34 @@ st.success("Logged in.")
 
 
 # ---------- API helpers ----------
-@st.cache_data(ttl=3)
-def get_questions():
+def get_version() -> str:
+    # چک ارزان: فقط نسخه‌ی اسکیما، نه کل سؤال‌ها
+    r = requests.get(f"{API}/questions/version", timeout=6)
+    r.raise_for_status()
+    return r.json().get("version", "")
+
+
+@st.cache_data(max_entries=2)
+def fetch_questions(version: str):
+    # کش بر اساس نسخه؛ فقط وقتی اسکیما عوض شود دوباره گرفته می‌شود
     r = requests.get(f"{API}/questions", timeout=6)
     r.raise_for_status()
     return r.json().get("questions", [])
 
 
+def get_questions():
+    return fetch_questions(get_version())
+
+
+def parse_options(raw: str) -> list:
+    opts = []
+    for i, chunk in enumerate([x.strip() for x in raw.split(",") if x.strip()]):
+        if ":" in chunk:
+            code, label = chunk.split(":", 1)
+            opts.append({"code": code.strip(), "label": label.strip(), "oorder": i})
+    return opts
+
+
 def create_question(payload: dict):
     r = requests.post(f"{API}/question", json=payload, timeout=8)
     r.raise_for_status()
@@ -105,12 +126,7 @@ new_raw_opts = st.text_area(
     key="new_raw_opts",
 )
 
-new_options = []
-if new_type != "text" and new_raw_opts.strip():
-    for i, chunk in enumerate([x.strip() for x in new_raw_opts.split(",") if x.strip()]):
-        if ":" in chunk:
-            code, label = chunk.split(":", 1)
-            new_options.append({"code": code.strip(), "label": label.strip(), "oorder": i})
+new_options = parse_options(new_raw_opts) if new_type != "text" else []
 
 if st.button("Save question"):
     try:
@@ -118,7 +134,6 @@ if st.button("Save question"):
             {"text": new_text, "qtype": new_type, "qorder": int(new_order), "options": new_options}
         )
         st.success(f"Saved. id={res.get('id')}")
-        get_questions.clear()
     except Exception as e:
         st.error(f"Save failed: {e}")
 
@@ -134,44 +149,78 @@ except Exception as e:
     st.error(f"Load questions failed: {e}")
     qs = []
 
+# فقط آیتم‌های باز ویجت کامل می‌گیرند
+if "open_qs" not in st.session_state:
+    st.session_state.open_qs = set()
+
+TYPES = ["single", "multi", "text"]
+
+
+def render_editor(q: dict):
+    qid = q["id"]
+    # فرم: تایپ کردن در فیلدها اسکریپت را دوباره اجرا نمی‌کند
+    with st.form(f"edit_{qid}"):
+        t = st.text_input("Text", value=q["text"], key=f"t_{qid}")
+        tp = st.selectbox(
+            "Type", TYPES,
+            index=TYPES.index(q["type"]) if q["type"] in TYPES else 0,
+            key=f"type_{qid}"
+        )
+        ordr = st.number_input("Order", value=q.get("order", 0), step=1, key=f"ord_{qid}")
+
+        cur = ", ".join([f"{o['code']}:{o['label']}" for o in q.get("options", [])])
+        raw2 = st.text_area("Options (code:Label, comma separated)", value=cur, key=f"opts_{qid}")
+
+        c1, c2 = st.columns(2)
+        with c1:
+            upd = st.form_submit_button("Update")
+        with c2:
+            dele = st.form_submit_button("Delete")
+
+    if upd:
+        try:
+            newopts = parse_options(raw2) if tp != "text" else []
+            update_question(qid, {"text": t, "qtype": tp, "qorder": int(ordr), "options": newopts})
+            st.success("Updated.")
+            st.rerun()
+        except Exception as e:
+            st.error(f"Update failed: {e}")
+    if dele:
+        try:
+            delete_question(qid)
+            st.session_state.open_qs.discard(qid)
+            st.warning("Deleted.")
+            st.rerun()
+        except Exception as e:
+            st.error(f"Delete failed: {e}")
+
+
 if not qs:
     st.info("No questions.")
 else:
-    for q in qs:
-        with st.expander(f"[{q['id']}] {q['text']}"):
-            t = st.text_input("Text", value=q["text"], key=f"t_{q['id']}")
-            tp = st.selectbox(
-                "Type", ["single", "multi", "text"],
-                index=["single", "multi", "text"].index(q["type"]),
-                key=f"type_{q['id']}"
-            )
-            ordr = st.number_input("Order", value=q.get("order", 0), step=1, key=f"ord_{q['id']}")
-
-            cur = ", ".join([f"{o['code']}:{o['label']}" for o in q.get("options", [])])
-            raw2 = st.text_area("Options (code:Label, comma separated)", value=cur, key=f"opts_{q['id']}")
-
-            newopts = []
-            if tp != "text" and raw2.strip():
-                for i, chunk in enumerate([x.strip() for x in raw2.split(",") if x.strip()]):
-                    if ":" in chunk:
-                        code, label = chunk.split(":", 1)
-                        newopts.append({"code": code.strip(), "label": label.strip(), "oorder": i})
-
-            c1, c2, c3 = st.columns(3)
-            with c1:
-                if st.button("Update", key=f"upd_{q['id']}"):
-                    try:
-                        update_question(q["id"], {"text": t, "qtype": tp, "qorder": int(ordr), "options": newopts})
-                        st.success("Updated.")
-                        get_questions.clear()
-                    except Exception as e:
-                        st.error(f"Update failed: {e}")
-            with c2:
-                if st.button("Delete", key=f"del_{q['id']}"):
-                    try:
-                        delete_question(q["id"])
-                        st.warning("Deleted.")
-                        get_questions.clear()
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"Delete failed: {e}")
+    f1, f2 = st.columns([3, 1])
+    with f1:
+        flt = st.text_input("Filter (text or id)", key="q_filter").strip().lower()
+    with f2:
+        page_size = st.selectbox("Per page", [10, 25, 50, 100], key="q_page_size")
+
+    if flt:
+        qs = [q for q in qs if flt in q["text"].lower() or flt == str(q["id"])]
+
+    pages = max(1, (len(qs) + page_size - 1) // page_size)
+    page = st.number_input(f"Page (1–{pages})", min_value=1, max_value=pages, value=1, step=1,
+                           key=f"q_page_{flt}_{page_size}")  # با عوض شدن فیلتر، صفحه ریست می‌شود
+    st.caption(f"{len(qs)} question(s)")
+
+    for q in qs[(page - 1) * page_size: page * page_size]:
+        qid = q["id"]
+        is_open = qid in st.session_state.open_qs
+        h1, h2 = st.columns([6, 1])
+        with h1:
+            st.markdown(f"**[{qid}]** {q['text']}  \n`{q['type']}` · order {q.get('order', 0)}")
+        with h2:
+            if st.button("Close" if is_open else "Edit", key=f"toggle_{qid}"):
+                st.session_state.open_qs.symmetric_difference_update({qid})
+                st.rerun()
+        if is_open:
+            render_editor(q)
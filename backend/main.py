@@ -1,7 +1,7 @@
 # backend/main.py
 from datetime import datetime
 from typing import Any, Dict, List, Optional
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response as HTTPResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from io import BytesIO
@@ -9,6 +9,8 @@ from fastapi.responses import StreamingResponse
 import openpyxl
 import json
 from collections import Counter
+import hashlib
+import threading
 
 
 from sqlalchemy import (
@@ -49,7 +51,8 @@ Base.metadata.create_all(engine)
 # ---------- App ----------
 app = FastAPI(title="Rail Survey API")
 app.add_middleware(
-    CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]
+    CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"],
+    expose_headers=["X-Export-Checkpoint", "X-Schema-Changed"],
 )
 
 def db() -> Session:
@@ -63,20 +66,131 @@ def db() -> Session:
 @app.get("/health")
 def health(): return {"ok": True}
 
+# ---------- Schema cache (compiled answer validator) ----------
+# validator فقط وقتی CRUD سؤال‌ها اسکیما را عوض کند دوباره ساخته می‌شود
+_schema_lock = threading.Lock()
+_schema_cache: Dict[str, Any] = {"version": None, "checks": None}
+
+def _check_single(codes):
+    def check(v):
+        if not isinstance(v, str): return "must be a string option code"
+        if v not in codes: return f"unknown option code {v!r}"
+    return check
+
+def _check_multi(codes):
+    def check(v):
+        if not isinstance(v, list): return "must be a list of option codes"
+        for c in v:
+            if not isinstance(c, str): return "must be a list of option codes"
+            if c not in codes: return f"unknown option code {c!r}"
+    return check
+
+def _check_text(v):
+    if not isinstance(v, str): return "must be a string"
+
+def _build_schema():
+    with SessionLocal() as s:
+        qrows = s.execute(select(Question).order_by(Question.id)).scalars().all()
+        orows = s.execute(select(Option).order_by(Option.question_id, Option.id)).scalars().all()
+
+    codes: Dict[int, set] = {}
+    for o in orows:
+        codes.setdefault(o.question_id, set()).add(o.code)
+
+    checks = {}
+    for q in qrows:
+        if q.qtype == "single":
+            checks[str(q.id)] = _check_single(frozenset(codes.get(q.id, ())))
+        elif q.qtype == "multi":
+            checks[str(q.id)] = _check_multi(frozenset(codes.get(q.id, ())))
+        else:  # text (مثل export)
+            checks[str(q.id)] = _check_text
+
+    return schema_version(qrows, orows), checks
+
+def schema_version(qrows, orows) -> str:
+    # نسخه از روی محتوای اسکیما ساخته می‌شود تا بعد از ری‌استارت هم ثابت بماند
+    # (مستقل از ترتیب کوئری، تا export هم بتواند از ردیف‌های خودش حساب کند)
+    sig = sorted([q.id, q.text, q.qtype, q.qorder] for q in qrows) + \
+          sorted([o.question_id, o.oorder, o.code, o.label] for o in orows)
+    return hashlib.sha1(json.dumps(sig, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+
+def get_schema():
+    """(version, checks) — checks: {str(qid): fn(value) -> error | None}"""
+    with _schema_lock:
+        if _schema_cache["checks"] is None:
+            _schema_cache["version"], _schema_cache["checks"] = _build_schema()
+        return _schema_cache["version"], _schema_cache["checks"]
+
+def invalidate_schema():
+    with _schema_lock:
+        _schema_cache["version"] = None
+        _schema_cache["checks"] = None
+
+def validate_answers(answers: Any) -> List[str]:
+    if not isinstance(answers, dict):
+        return ["answers must be a JSON object"]
+    _, checks = get_schema()
+    errors = []
+    for qid, v in answers.items():
+        check = checks.get(str(qid))
+        if check is None:
+            errors.append(f"question {qid}: unknown question id")
+            continue
+        if v is None:  # بدون پاسخ
+            continue
+        err = check(v)
+        if err: errors.append(f"question {qid}: {err}")
+    return errors
+
+# ---------- Delta export checkpoints ----------
+# توکن: "<max Response.id>:<schema version>" — با ?since=<token> فقط پاسخ‌های جدید برمی‌گردند
+def parse_checkpoint(since: Optional[str]):
+    if not since:
+        return 0, None
+    try:
+        last_id, version = since.split(":", 1)
+        last_id = int(last_id)
+    except ValueError:
+        raise HTTPException(400, "invalid checkpoint token")
+    if not 0 <= last_id < 2**63:  # محدوده‌ی INTEGER در SQLite
+        raise HTTPException(400, "invalid checkpoint token")
+    return last_id, version
+
+def load_responses(s: Session, after_id: int):
+    return s.execute(
+        select(Response).where(Response.id > after_id).order_by(Response.id)
+    ).scalars().all()
+
+def checkpoint_headers(rrows, after_id: int, since_version: Optional[str], version: str) -> Dict[str, str]:
+    # version باید قبل از (یا همراه با) خواندن داده‌ها گرفته شود، نه بعد از ساخت فایل
+    last_id = rrows[-1].id if rrows else after_id
+    changed = since_version is not None and since_version != version
+    return {
+        "X-Export-Checkpoint": f"{last_id}:{version}",
+        "X-Schema-Changed": "true" if changed else "false",
+    }
+
 # ---------- Responses ----------
 @app.post("/submit")
 def submit(payload: Dict[str, Any]):
     if not isinstance(payload, dict):
         raise HTTPException(400, "payload must be a JSON object")
+    errors = validate_answers(payload.get("answers", {}))
+    if errors:
+        raise HTTPException(400, "; ".join(errors))
     with SessionLocal() as s:
         r = Response(ts=datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"), payload=payload)
         s.add(r); s.commit()
     return {"ok": True}
 
 @app.get("/responses")
-def responses() -> List[Dict[str, Any]]:
+def responses(http: HTTPResponse, since: Optional[str] = None) -> List[Dict[str, Any]]:
+    after_id, since_version = parse_checkpoint(since)
+    version, _ = get_schema()
     with SessionLocal() as s:
-        rows = s.execute(select(Response).order_by(Response.id)).scalars().all()
+        rows = load_responses(s, after_id)
+        http.headers.update(checkpoint_headers(rows, after_id, since_version, version))
         return [{"id":r.id, "ts":r.ts, "payload":r.payload} for r in rows]
 
 # ---------- Questions CRUD ----------
@@ -109,6 +223,7 @@ def create_question(q: Dict[str, Any]):
                          label=o.get("label",""),
                          oorder=i))
         s.commit()
+        invalidate_schema()
 
         return {"id": qrow.id}
 
@@ -128,6 +243,12 @@ def get_questions():
             })
         return {"questions": out}
 
+# نسخه‌ی اسکیما (چک ارزان برای پنل ادمین به‌جای گرفتن کل /questions)
+@app.get("/questions/version")
+def get_questions_version():
+    version, _ = get_schema()
+    return {"version": version}
+
 # ویرایش سؤال (آپدیت کامل + جایگزینی گزینه‌ها)
 @app.put("/question/{qid}")
 def update_question(qid: int, q: Dict[str, Any]):
@@ -144,6 +265,7 @@ def update_question(qid: int, q: Dict[str, Any]):
         for i,o in enumerate(opts):
             s.add(Option(question_id=qid, code=o.get("code",f"opt{i}"), label=o.get("label",""), oorder=i))
         s.add(row); s.commit()
+        invalidate_schema()
         return {"ok": True}
 
 # حذف سؤال
@@ -154,6 +276,7 @@ def delete_question(qid: int):
         row = s.get(Question, qid)
         if row: s.delete(row)
         s.commit()
+    invalidate_schema()
     return {"ok": True}
 # ---------- Excel Export ----------
 from io import BytesIO
@@ -163,12 +286,14 @@ from collections import Counter
 from sqlalchemy import select
 
 @app.get("/export.xlsx")
-def export_excel():
+def export_excel(since: Optional[str] = None):
+    after_id, since_version = parse_checkpoint(since)
     # 1) داده‌ها از DB
     with SessionLocal() as s:
         qrows = s.execute(select(Question).order_by(Question.qorder, Question.id)).scalars().all()
         orows = s.execute(select(Option).order_by(Option.oorder, Option.id)).scalars().all()
-        rrows = s.execute(select(Response).order_by(Response.id)).scalars().all()
+        rrows = load_responses(s, after_id)
+    version = schema_version(qrows, orows)
 
     # 2) map گزینه‌ها: {qid: {code: label}}
     optmap = {}
@@ -226,7 +351,8 @@ def export_excel():
     buf = BytesIO()
     wb.save(buf)
     buf.seek(0)
-    headers = {"Content-Disposition": 'attachment; filename="survey_export.xlsx"'}
+    headers = {"Content-Disposition": 'attachment; filename="survey_export.xlsx"',
+               **checkpoint_headers(rrows, after_id, since_version, version)}
     return StreamingResponse(
         buf,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
@@ -239,12 +365,14 @@ import openpyxl, json
 from sqlalchemy import select
 
 @app.get("/export_flat.xlsx")
-def export_excel_flat():
+def export_excel_flat(since: Optional[str] = None):
+    after_id, since_version = parse_checkpoint(since)
     # 1) load data
     with SessionLocal() as s:
         qrows = s.execute(select(Question).order_by(Question.qorder, Question.id)).scalars().all()
         orows = s.execute(select(Option).order_by(Option.oorder, Option.id)).scalars().all()
-        rrows = s.execute(select(Response).order_by(Response.id)).scalars().all()
+        rrows = load_responses(s, after_id)
+    version = schema_version(qrows, orows)
 
     # map: question id -> {code: label}
     optmap = {}
@@ -299,7 +427,8 @@ def export_excel_flat():
     return StreamingResponse(
         buf,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": 'attachment; filename="survey_export_flat.xlsx"'},
+        headers={"Content-Disposition": 'attachment; filename="survey_export_flat.xlsx"',
+                 **checkpoint_headers(rrows, after_id, since_version, version)},
     )
 
 
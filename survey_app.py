@@ -219,7 +219,9 @@ if "submitted" in locals() and submitted:
         st.warning("Please answer all required questions:\n\n- " + "\n- ".join(missing))
     else:
         try:
-            payload = {"answers": st.session_state.answers}
+            # فقط سؤال‌های فعلی؛ سؤال حذف‌شده در سشن باعث 400 می‌شود
+            answers = st.session_state.answers
+            payload = {"answers": {q["id"]: answers[q["id"]] for q in questions if q["id"] in answers}}
             res = submit_answers(payload)
             if res.get("ok"):
                 
@@ -236,5 +238,12 @@ if "submitted" in locals() and submitted:
                 st.session_state.answers = {}
             else:
                 st.error(f"Backend did not confirm success: {json.dumps(res)}")
+        except requests.HTTPError as e:
+            detail = ""
+            try:
+                detail = e.response.json().get("detail", "")
+            except Exception:
+                pass
+            st.error(f"Submit failed: {detail or e}")
         except Exception as e:
             st.error(f"Submit failed: {e}")